@@ -0,0 +1,92 @@
+"""Embedding-based intent classification for supervisor routing.
+
+Routing a fresh user message is a 2-way domain decision (music catalog vs
+invoices), which an embedding similarity check answers in a single cheap
+embeddings call instead of a chat completion. The exemplar phrases below are
+embedded once in one batched embed_documents call and collapsed into a centroid
+per domain; classification is then a dot product against the two centroids.
+
+classify_intents accepts a list so concurrent supervisor turns (multi-tenant
+bursts) can amortize one API round-trip over a mini-batch of messages.
+"""
+
+import math
+
+from utils import embedding_model
+
+_MUSIC_EXEMPLARS = [
+    "Do you have any albums by this artist?",
+    "What songs do you have in the rock genre?",
+    "Can you recommend music similar to what I like?",
+    "Is this track available in your catalog?",
+    "Show me all the albums from that band",
+]
+
+_INVOICE_EXEMPLARS = [
+    "Can I see my most recent invoice?",
+    "How much did I spend on my last purchase?",
+    "Show me my billing history",
+    "Which employee handled my order?",
+    "What were the items on my invoice from last month?",
+]
+
+# Require a clear similarity margin between the two domains before trusting the
+# fast path; ambiguous messages fall back to the LLM router.
+_MARGIN = 0.05
+
+# The margin alone only detects ambiguity BETWEEN the domains - an off-topic
+# message ("what's the weather?") can still sit slightly closer to one centroid.
+# The best score must also clear this absolute floor, otherwise the message is
+# treated as off-domain and left to the LLM router (which owns the END path).
+# Calibrated for text-embedding-ada-002 (the OpenAIEmbeddings default in
+# utils.py), whose cosine similarities are compressed into a narrow band:
+# unrelated text scores roughly 0.65-0.8, on-domain text roughly 0.8+. Re-tune
+# this if the embedding model changes.
+_MIN_SIMILARITY = 0.78
+
+# Lazily built {label: centroid} matrix - one batched embedding call, first use only.
+_centroids: dict[str, list[float]] | None = None
+
+
+def _mean(vectors: list[list[float]]) -> list[float]:
+    return [sum(dims) / len(vectors) for dims in zip(*vectors)]
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    return dot / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+async def _get_centroids() -> dict[str, list[float]]:
+    global _centroids
+    if _centroids is None:
+        # Single batched call for every exemplar across both domains
+        vectors = await embedding_model.aembed_documents(_MUSIC_EXEMPLARS + _INVOICE_EXEMPLARS)
+        _centroids = {
+            "music_catalog_subagent": _mean(vectors[: len(_MUSIC_EXEMPLARS)]),
+            "invoice_information_subagent": _mean(vectors[len(_MUSIC_EXEMPLARS):]),
+        }
+    return _centroids
+
+
+async def classify_intents(texts: list[str]) -> list[str | None]:
+    """Classify a mini-batch of user messages into subagent labels.
+
+    Returns one label per input text, or None where the similarity margin is too
+    small to call confidently (the caller should fall back to the LLM router).
+    """
+    centroids = await _get_centroids()
+    vectors = await embedding_model.aembed_documents(texts)
+    labels: list[str | None] = []
+    for vector in vectors:
+        scores = {label: _cosine(vector, centroid) for label, centroid in centroids.items()}
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        margin = scores[ranked[0]] - scores[ranked[1]]
+        confident = margin >= _MARGIN and scores[ranked[0]] >= _MIN_SIMILARITY
+        labels.append(ranked[0] if confident else None)
+    return labels
+
+
+async def classify_intent(text: str) -> str | None:
+    """Single-message convenience wrapper around classify_intents."""
+    return (await classify_intents([text]))[0]
@@ -0,0 +1,46 @@
+"""Shared LLM clients for the supervisor patterns.
+
+Each ChatOpenAI instance builds its own httpx client with its own connection
+pool, so instantiating one per module means duplicated TLS handshakes, DNS
+lookups, and tokenizer/schema caches. The supervisor modules import the
+singleton below instead so every supervisor call reuses one HTTP connection
+pool and the SDK's internal caches.
+"""
+
+from langchain_anthropic import ChatAnthropic
+from langchain_openai import ChatOpenAI
+
+from utils import http_client, http_async_client
+
+# NOTE: Configure the supervisor LLM that you want to use (see utils.py for the
+# subagent LLM). Both command_send.py and handoff_tools.py share this instance,
+# and all instances here ride the project-wide httpx connection pool from utils.
+model = ChatOpenAI(model="o3-mini", http_client=http_client, http_async_client=http_async_client)
+
+# The routing decision is a 3-way classification plus a one-line context string -
+# a reasoning model's hidden chain-of-thought tokens are pure latency overhead
+# there, so routing uses a cheap fast model while summaries stay on `model`.
+# Decode time is token-bound, so max_tokens caps the Steps JSON - but the cap
+# must leave room for the worst legitimate plan (two steps, each with a verbose
+# context string): strict mode constrains the output's shape, not its length,
+# and a truncated completion fails parsing and the whole turn. 600 tokens fits a
+# two-step plan with generous context while still bounding a runaway decode. If
+# you swap in a reasoning model here, also set reasoning_effort="low" so hidden
+# chain-of-thought tokens don't dominate router latency.
+# temperature=0 keeps routing deterministic, which also makes the router
+# decision cache in command_send.py safe: a cached Step is the same Step a
+# fresh call would have produced.
+router_llm = ChatOpenAI(model="gpt-4o-mini", temperature=0, max_tokens=600, http_client=http_client, http_async_client=http_async_client)
+
+# PROMPT CACHING
+# The supervisor-side system prompts are static and re-sent on every turn, so
+# they are marked as cacheable system blocks. Anthropic needs an explicit
+# cache_control marker on the block; OpenAI automatically caches byte-identical
+# prompt prefixes (>=1024 tokens), so the plain string is already cache-friendly
+# there. On cache hits this cuts prefill latency and input-token cost for the
+# repeated prefix.
+def cached_system(prompt: str) -> str | list[dict]:
+    """Wrap a static system prompt so repeated turns hit the provider's prompt cache."""
+    if isinstance(model, ChatAnthropic):
+        return [{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}]
+    return prompt
@@ -41,7 +41,7 @@ Note: You can mix patterns - use handoffs for agent switching, and have each age
 """
 
 from langchain_core.runnables import RunnableConfig
-from langchain_openai import ChatOpenAI
+from agents._llm import model, cached_system
 from agents.invoice_agent import graph as invoice_information_subagent
 from agents.music_agent import graph as music_catalog_subagent
 from langgraph.graph import StateGraph, START, END
@@ -51,11 +51,8 @@ from langchain_core.messages import ToolMessage, SystemMessage
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.managed.is_last_step import RemainingSteps
 from langchain_core.tools import tool, InjectedToolCallId
-from langgraph.prebuilt import InjectedState
+from langgraph.prebuilt import InjectedState, create_react_agent
 from langgraph.types import Command
-from langgraph.prebuilt import ToolNode, InjectedState, tools_condition
-from langgraph.graph import StateGraph, START
-from langgraph.prebuilt import create_react_agent
 
 class InputState(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]
@@ -65,9 +62,8 @@ class State(InputState):
     loaded_memory: NotRequired[str]  # Optional memory state
     remaining_steps: NotRequired[RemainingSteps]  # Execution control
 
-model = ChatOpenAI(model="o3-mini")
 
-# HANDOFFS PATTERN - TOOLS IMPLEMENTATION  
+# HANDOFFS PATTERN - TOOLS IMPLEMENTATION
 # From LangChain docs: "Agents can directly pass control to each other. The 'active' agent changes,
 # and the user interacts with whichever agent currently has control."
 # These tools demonstrate the "handoffs as tools" pattern where tools return Command objects
@@ -111,7 +107,9 @@ def transfer_to_invoice_agent(
     # Return Command object that specifies:
     # - goto: which node to navigate to
     # - update: how to update the state (add the handoff message)
-    return Command(goto=agent_name, update={"messages": state["messages"] + [tool_message]})
+    # Only the new message is returned; the add_messages reducer appends it, so
+    # re-sending the full history would just force an O(N) merge per handoff.
+    return Command(goto=agent_name, update={"messages": [tool_message]})
 
 @tool("transfer-to-music-catalog-agent")
 def transfer_to_music_catalog_agent(
@@ -133,7 +131,8 @@ def transfer_to_music_catalog_agent(
         tool_call_id=tool_call_id,
     )
 
-    return Command(goto=agent_name, update={"messages": state["messages"] + [tool_message]})
+    # Same as the invoice transfer: return only the delta and let add_messages append.
+    return Command(goto=agent_name, update={"messages": [tool_message]})
 
 # SUPERVISOR SETUP
 tools = [transfer_to_invoice_agent, transfer_to_music_catalog_agent]
@@ -153,7 +152,9 @@ DECISION LOGIC:
 
 IMPORTANT: After a subagent completes their task, if there's no more help needed from your team, your job is to act as the final interface to the user - synthesize the subagent's response and present it conversationally, don't just add generic follow-ups."""
 
-supervisor = create_react_agent(model, tools=tools, prompt=supervisor_prompt, state_schema=State, name="supervisor")
+# The cacheable system prompt always sits first in the agent's message list, so the
+# provider-side prompt cache fires on every turn.
+supervisor = create_react_agent(model, tools=tools, prompt=SystemMessage(content=cached_system(supervisor_prompt)), state_schema=State, name="supervisor")
 
 # GRAPH CONSTRUCTION
 # This pattern requires adding the subagent graphs as separate nodes
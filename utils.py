@@ -1,11 +1,19 @@
 import os
+import httpx
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
+# One shared HTTP client pair for every ChatOpenAI instance in the project. Each
+# ChatOpenAI otherwise builds its own httpx client, so parallel fan-out across the
+# supervisor and both subagents could not reuse TLS sessions or pooled connections.
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+http_client = httpx.Client(limits=_HTTP_LIMITS)
+http_async_client = httpx.AsyncClient(limits=_HTTP_LIMITS)
+
 # NOTE: Configure the LLM that you want to use
-llm = ChatOpenAI(model_name="gpt-4o", temperature=0)
+llm = ChatOpenAI(model_name="gpt-4o", temperature=0, http_client=http_client, http_async_client=http_async_client)
 # llm = ChatAnthropic(model_name="claude-3-5-sonnet-20240620", temperature=0)
 # llm = ChatVertexAI(model_name="gemini-1.5-flash-002", temperature=0)
 